@@ -1,18 +1,43 @@
-import json
 import glob
+import orjson
 import matplotlib.pyplot as plt
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def load_results():
-    """Load all result files from the results directory."""
+# Seconds between refreshes while watching results/ for new and running experiments, or None for a static plot
+WATCH_INTERVAL = None
+
+def _read_result(file):
+    """Parse one result file, or return None if it was removed before it could be read."""
+    try:
+        return orjson.loads(Path(file).read_bytes())
+    except FileNotFoundError:
+        return None
+
+def load_results(include_progress=False):
+    """
+    Load all result files from the results directory.
+    With include_progress, runs that are still in progress are loaded from
+    their progress files too, for the watch mode.
+    """
+    # List progress files first: a run that finishes in between then still
+    # has its results file listed below
+    progress_files = glob.glob("results/progress_*.json") if include_progress else []
     result_files = glob.glob("results/results_*.json")
-    results = []
-    
-    for file in result_files:
-        with open(file, 'r') as f:
-            data = json.load(f)
-            results.append(data)
+
+    # Read and parse the files in parallel threads
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = [r for r in executor.map(_read_result, result_files) if r is not None]
+        progress = [r for r in executor.map(_read_result, progress_files) if r is not None]
+
+    # A finished run's results file supersedes its progress file
+    finished = {_result_key(r) for r in results}
+    results += [r for r in progress if _result_key(r) not in finished]
+
+    # Infer each result's range once, rather than in every helper that needs it
+    for result in results:
+        result['_range'] = _infer_range_from_result(result)
     
     return results
 
@@ -33,13 +58,13 @@ def _infer_range_from_result(result):
                 return len(ac)
     return 0
 
-def _attempt_percentages_for_result(result, max_range):
+def _attempt_percentages_for_result(result, local_range, max_range):
     """
     Return a length=max_range list of per-attempt success percentages for a single result.
+    local_range is the result's own attempt range, as set in result['_range'] by load_results.
     This function relies exclusively on 'attempt_counts'.
     """
     num_games = float(result.get('num_games', 1)) or 1.0
-    local_range = _infer_range_from_result(result)
     per_attempt_pct = np.zeros(max_range, dtype=float)
 
     if 'attempt_counts' in result and result['attempt_counts'] is not None:
@@ -47,17 +72,20 @@ def _attempt_percentages_for_result(result, max_range):
         counts = np.zeros(local_range, dtype=float)
         if isinstance(ac, list):
             # Trim or pad to local_range
-            for i in range(min(len(ac), local_range)):
-                counts[i] = ac[i]
+            arr = np.asarray(ac[:local_range], dtype=float)
+            counts[:len(arr)] = arr
         elif isinstance(ac, dict):
             # Keys could be "1", 1, etc., and attempts are 1-indexed
+            pairs = []
             for k, v in ac.items():
                 try:
-                    idx = int(k) - 1
-                    if 0 <= idx < local_range:
-                        counts[idx] = float(v)
+                    pairs.append((int(k), float(v)))
                 except Exception:
                     continue
+            keys = np.fromiter((k for k, _ in pairs), dtype=np.int64, count=len(pairs))
+            vals = np.fromiter((v for _, v in pairs), dtype=float, count=len(pairs))
+            mask = (keys >= 1) & (keys <= local_range)
+            counts[keys[mask] - 1] = vals[mask]
         # Convert to % of games
         with np.errstate(divide='ignore', invalid='ignore'):
             pct = (counts / num_games) * 100.0
@@ -66,25 +94,51 @@ def _attempt_percentages_for_result(result, max_range):
         
     return per_attempt_pct
 
-def create_histogram_plot(results):
-    """Create a grouped bar chart (histogram) of per-attempt success percentages."""
+OFFICIAL_COLORS = {
+    'openai': "#74AA9C", 
+    'google': "#4285F4", 
+    'anthropic': "#C15F3C",
+    'control': 'dimgrey'  # Added 'control' color
+}
+
+# Substrings of a model name that identify its provider
+MODEL_PROVIDERS = (('gpt', 'openai'), ('gemini', 'google'), ('claude', 'anthropic'), ('control', 'control'))
+
+def _resolve_color(model):
+    """Return the provider's official color for a model name, or None if unknown."""
+    model = model.lower() # Use lower for matching
+    for key, provider in MODEL_PROVIDERS:
+        if key in model:
+            return OFFICIAL_COLORS[provider]
+    return None
+
+def _result_key(result):
+    """Identify a result across reloads of the results directory."""
+    return (result.get('api_provider'), result.get('model'), result.get('timestamp'))
+
+def create_histogram_plot(results, bar_containers=None):
+    """
+    Create a grouped bar chart (histogram) of per-attempt success percentages.
+    If a bar_containers dict is given, each result's bars are stored in it by
+    _result_key so that update_histogram_plot can refresh them later.
+    """
     fig, ax = plt.subplots(figsize=(12, 8))
 
     if not results:
         return fig
 
     # Determine the common x-axis based on the maximum range among results
-    max_range = max(_infer_range_from_result(r) for r in results)
+    max_range = max(r['_range'] for r in results)
     attempts = np.arange(1, max_range + 1)
 
-    # Colors
-    colors = plt.cm.Set1(np.linspace(0, 1, max(2, len(results))))
-    official_colors = {
-        'openai': "#74AA9C", 
-        'google': "#4285F4", 
-        'anthropic': "#C15F3C",
-        'control': 'dimgrey'  # Added 'control' color
-    }    
+    # Colors, resolved once per result; Set1 is only needed for unknown models
+    model_colors = [_resolve_color(r.get('model', f'Model {i+1}')) for i, r in enumerate(results)]
+    if any(color is None for color in model_colors):
+        colors = plt.cm.Set1(np.linspace(0, 1, max(2, len(results))))
+        model_colors = [
+            colors[i % len(colors)] if color is None else color
+            for i, color in enumerate(model_colors)
+        ]
 
     # Bar layout
     k = len(results)  # number of models
@@ -93,22 +147,9 @@ def create_histogram_plot(results):
     offsets = (np.arange(k) - (k - 1) / 2.0) * bar_width
 
     # Plot each model's bars side-by-side
-    for i, result in enumerate(results):
-        model = result.get('model', f'Model {i+1}').lower() # Use lower for matching
-
-        if 'gpt' in model:
-            color = official_colors['openai']
-        elif 'gemini' in model:
-            color = official_colors['google']
-        elif 'claude' in model:
-            color = official_colors['anthropic']
-        elif 'control' in model:
-            color = official_colors['control']
-        else:
-            color = colors[i % len(colors)]
-
-        per_attempt_pct = _attempt_percentages_for_result(result, max_range)
-        ax.bar(
+    for i, (result, color) in enumerate(zip(results, model_colors)):
+        per_attempt_pct = _attempt_percentages_for_result(result, result['_range'], max_range)
+        bars = ax.bar(
             attempts + offsets[i],
             per_attempt_pct,
             width=bar_width,
@@ -118,6 +159,8 @@ def create_histogram_plot(results):
             linewidth=0.5,
             color=color,
         )
+        if bar_containers is not None:
+            bar_containers[_result_key(result)] = bars
 
     #  Add dashed line at 10% level 
     expected_level = 100 / max_range
@@ -136,6 +179,48 @@ def create_histogram_plot(results):
     plt.tight_layout()
     return fig
 
+def update_histogram_plot(fig, bar_containers, results):
+    """
+    Refresh the bar heights of a plot made by create_histogram_plot in place.
+    Returns False, leaving the plot untouched, if the set of results or the
+    attempt range has changed and the plot must be created again.
+    """
+    if {_result_key(r) for r in results} != set(bar_containers):
+        return False
+    if not results:
+        # Nothing to show yet, so keep the empty figure until a run starts
+        return True
+    max_range = max(r['_range'] for r in results)
+    if any(len(bars) != max_range for bars in bar_containers.values()):
+        return False
+
+    for result in results:
+        per_attempt_pct = _attempt_percentages_for_result(result, result['_range'], max_range)
+        for bar, height in zip(bar_containers[_result_key(result)], per_attempt_pct):
+            bar.set_height(height)
+    fig.canvas.draw_idle()
+    return True
+
+def watch_results(interval):
+    """Show the histogram and keep refreshing it from the results directory until the window is closed."""
+    plt.ion()
+    bar_containers = {}
+    results = load_results(include_progress=True)
+    if not results:
+        print("No result files found yet. Waiting for a run to start...")
+    fig = create_histogram_plot(results, bar_containers)
+    plt.show()
+
+    while plt.fignum_exists(fig.number):
+        plt.pause(interval)
+        results = load_results(include_progress=True)
+        if not update_histogram_plot(fig, bar_containers, results):
+            # New or removed runs change the layout, so draw the plot from scratch
+            plt.close(fig)
+            bar_containers = {}
+            fig = create_histogram_plot(results, bar_containers)
+            plt.show()
+
 def print_summary(results):
     """Print a summary of all loaded results."""
     print("Summary of Results:")
@@ -144,7 +229,7 @@ def print_summary(results):
     for result in results:
         print(f"Model: {result.get('model')}")
         print(f"Games: {result.get('num_games')}")
-        rng = _infer_range_from_result(result)
+        rng = result['_range']
         explicit_rng = result.get('number_range', rng)
         print(f"Range: 1-{explicit_rng}")
         print(f"Timestamp: {result.get('timestamp')}")
@@ -164,6 +249,10 @@ def print_summary(results):
 
 def main():
     """Main function to load results and create plots."""
+    if WATCH_INTERVAL is not None:
+        watch_results(WATCH_INTERVAL)
+        return
+
     results = load_results()
     
     if not results:
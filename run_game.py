@@ -1,47 +1,145 @@
 import os
 import random
-import json
+import re
+import asyncio
+import time
+import hashlib
+from collections import Counter
 from datetime import datetime
+import numpy as np
+import orjson
+
+try:
+    # uvloop is faster for socket-heavy workloads, but it is not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Configuration
 API_PROVIDER = "anthropic"  # Change to "openai", "anthropic", "google", or "control"
 NUMBER_RANGE = 10  # Numbers from 1 to this value
 NUM_GAMES = 100
+GUESS_VALUES = tuple(range(1, NUMBER_RANGE + 1))  # Every possible guess, permuted per game
+
+# Throughput limits for concurrent games
+MAX_CONCURRENT = 20  # Maximum number of API requests in flight at once
+MAX_RPM = 500  # Requests per minute allowed by the provider account
+MAX_TPM = 200000  # Tokens per minute allowed by the provider account
+MAX_RETRIES = 5  # Retries with randomized exponential backoff after a rate limit or transient error
+MAX_RETRY_DELAY = 30  # Upper bound in seconds on a single backoff
+MAX_MALFORMED_RETRIES = 3  # Correction prompts per guess before the game counts as failed
+MAX_OUTPUT_TOKENS = 16  # Anthropic reply cap; OpenAI and Gemini count reasoning tokens against theirs
+
+# Reuse one stored reply to the setup prompt instead of asking for it in every game
+CACHE_SETUP_RESPONSE = True
+SETUP_CACHE_FILE = "results/setup_cache.json"
+MAX_CHOICES_PER_REQUEST = 128  # OpenAI limit on n when setups are not cached
+
+# Constrain replies to guesses to the two valid responses with provider-side
+# structured output, so malformed replies and their correction turns cannot occur.
+# Off by default to keep the free-text protocol of the published results.
+STRUCTURED_OUTPUT = False
+
+# Share one in-flight request between games that send an identical conversation.
+# Off by default: coalesced games get the same reply and stop being independent samples.
+COALESCE_REQUESTS = False
+
+# Submit every guess turn as one offline job through the OpenAI or Anthropic Batch
+# API instead of playing live. Cheaper for large runs, but results take up to 24 h.
+USE_BATCH_API = False
+BATCH_INPUT_FILE = "results/batch_input.jsonl"  # Upload file for OpenAI batches
+BATCH_POLL_INTERVAL = 60  # Seconds between batch status checks
+
+# The rules go in a system prompt that is identical for every request. It is sent
+# ahead of each game's append-only conversation of user and assistant turns, so
+# providers with prompt prefix caching can reuse the prefix across turns and games.
+SYSTEM_PROMPT = f"Number guessing game: think of a number from 1 to {NUMBER_RANGE} and keep it secret. Answer each guess with exactly 'correct' or 'not correct', no other words or punctuation, and never an empty reply."
+SETUP_PROMPT = "Think of your number now and reply 'Okay, I have a number.' without revealing it."
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+VALID_RESPONSES = ('correct', 'not correct')
+# Matches exactly one valid response, ignoring case and surrounding whitespace
+RESPONSE_PATTERN = re.compile(r"\s*(not )?correct\s*", re.IGNORECASE)
+
+# Structured output schemas used when STRUCTURED_OUTPUT is enabled
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {"result": {"type": "string", "enum": list(VALID_RESPONSES)}},
+    "required": ["result"],
+    "additionalProperties": False
+}
+OPENAI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "answer", "strict": True, "schema": ANSWER_SCHEMA}
+}
+ANTHROPIC_ANSWER_TOOL = {
+    "name": "answer",
+    "description": "Answer whether the guess is correct.",
+    "input_schema": ANSWER_SCHEMA
+}
+ANTHROPIC_TOOL_MAX_TOKENS = 64  # Room for the answer tool call
+GEMINI_ANSWER_CONFIG = {
+    "response_mime_type": "text/x.enum",
+    "response_schema": {"type": "STRING", "enum": list(VALID_RESPONSES)}
+}
+
+# Shared HTTP connection pool, for providers whose SDK accepts one
+http_client = None
+
+def make_http_client():
+    """Build one long-lived HTTP/2 connection pool for all concurrent games to share."""
+    import httpx
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=60),
+        timeout=60.0
+    )
 
 # Model configuration based on provider
 if API_PROVIDER == "openai":
     import openai
     MODEL_NAME = "gpt-5-mini"  # or "gpt-4", "gpt-3.5-turbo", etc.
-    
+
     # Retrieve the OpenAI API key from the environment variable
     openai.api_key = os.environ.get("OPENAI_API_KEY")
     if not openai.api_key:
         raise ValueError("The OPENAI_API_KEY environment variable is not set.")
-    
-    client = openai.OpenAI()
-    
+
+    # Retries are left to throttled_request, so every attempt goes through the rate limiter
+    http_client = make_http_client()
+    client = openai.AsyncOpenAI(http_client=http_client, max_retries=0)
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
 elif API_PROVIDER == "anthropic":
     import anthropic
     MODEL_NAME = "claude-sonnet-4-20250514"  # or "claude-3-opus-20240229", "claude-3-haiku-20240307"
-    
+
     # Retrieve the Anthropic API key from the environment variable
     api_key = os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
         raise ValueError("The ANTHROPIC_API_KEY environment variable is not set.")
-    
-    client = anthropic.Anthropic(api_key=api_key)
+
+    # Retries are left to throttled_request, so every attempt goes through the rate limiter
+    http_client = make_http_client()
+    client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+    RETRYABLE_ERRORS = (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)
 
 elif API_PROVIDER == "google":
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     MODEL_NAME = "gemini-2.5-flash"  # or "gemini-1.5-pro", etc.
-    
+
     # Retrieve the Google AI Studio API key from the environment variable
     api_key = os.environ.get("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("The GOOGLE_API_KEY environment variable is not set.")
-    
+
     genai.configure(api_key=api_key)
-    client = genai.GenerativeModel(MODEL_NAME)
+    client = genai.GenerativeModel(MODEL_NAME, system_instruction=SYSTEM_PROMPT)
+    RETRYABLE_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded
+    )
 
 elif API_PROVIDER == 'control':
     MODEL_NAME = "control"
@@ -49,204 +147,625 @@ elif API_PROVIDER == 'control':
 else:
     raise ValueError(f"Unknown API provider: {API_PROVIDER}")
 
-# Track attempts per game
-attempt_counts = [0] * NUMBER_RANGE
+if USE_BATCH_API and API_PROVIDER not in ("openai", "anthropic"):
+    raise ValueError(f"The Batch API is not supported for provider: {API_PROVIDER}")
+
+class LLMCache:
+    """Model replies keyed by a hash of the request, persisted to a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self.entries = orjson.loads(f.read())
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the parts that determine a reply into a cache key."""
+        return hashlib.sha256(orjson.dumps(parts)).hexdigest()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            f.write(orjson.dumps(self.entries, option=orjson.OPT_INDENT_2))
+
+class RateLimiter:
+    """Leaky-bucket throttle keeping requests and tokens under the per-minute limits."""
+
+    def __init__(self, max_rpm, max_tpm):
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.available_request_capacity = max_rpm
+        self.available_token_capacity = max_tpm
+        self.last_update = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _replenish(self):
+        """Refill both buckets in proportion to the time since the last update."""
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.available_request_capacity = min(
+            self.max_rpm, self.available_request_capacity + self.max_rpm * elapsed / 60
+        )
+        self.available_token_capacity = min(
+            self.max_tpm, self.available_token_capacity + self.max_tpm * elapsed / 60
+        )
+        self.last_update = now
+
+    async def acquire(self, tokens):
+        """Wait until there is capacity for one request of the given token size."""
+        async with self.lock:
+            while True:
+                self._replenish()
+                if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= tokens
+                    return
+                await asyncio.sleep(0.1)
 
-def call_api(conversation):
-    """Call the appropriate API based on the configured provider."""
+api_semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+rate_limiter = RateLimiter(MAX_RPM, MAX_TPM)
+
+def estimate_tokens(conversation):
+    """Rough token count for a request, assuming about 4 characters per token."""
+    return (len(SYSTEM_PROMPT) + sum(len(msg["content"]) for msg in conversation)) // 4 + 1
+
+# Pending requests by conversation hash, used when COALESCE_REQUESTS is enabled
+inflight_requests = {}
+
+async def call_api(conversation, expect_label=False, chat_session=None):
+    """Call the configured API while respecting the concurrency and rate limits.
+
+    With expect_label set, the reply should be one of VALID_RESPONSES and is
+    cut off as soon as it can no longer become one. A chat_session holding the
+    earlier turns of this conversation is only used by Gemini.
+    """
+    # Coalesced games would share one reply but not each other's chat sessions
+    if not COALESCE_REQUESTS or chat_session is not None:
+        return await throttled_request(send_request, conversation, expect_label, chat_session)
+
+    key = LLMCache.make_key(conversation)
+    if key not in inflight_requests:
+        task = asyncio.ensure_future(throttled_request(send_request, conversation, expect_label))
+        task.add_done_callback(lambda _: inflight_requests.pop(key, None))
+        inflight_requests[key] = task
+    return await inflight_requests[key]
+
+async def throttled_request(request, conversation, *args):
+    """Await request(conversation, *args) under the concurrency and rate limits."""
+    estimated_tokens = estimate_tokens(conversation)
+    async with api_semaphore:
+        for retry in range(MAX_RETRIES + 1):
+            await rate_limiter.acquire(estimated_tokens)
+            try:
+                return await request(conversation, *args)
+            except RETRYABLE_ERRORS as e:
+                if retry == MAX_RETRIES:
+                    raise
+                delay = random.uniform(1, min(MAX_RETRY_DELAY, 2 ** (retry + 1)))
+                print(f"{type(e).__name__}, retrying in {delay:.1f} s")
+                await asyncio.sleep(delay)
+
+def classify_response(response):
+    """Return the valid response a reply matches, or None if it is malformed."""
+    # fullmatch rejects long, over-explained replies at the first mismatch
+    # instead of lowercasing and stripping the whole string
+    match = RESPONSE_PATTERN.fullmatch(response)
+    if match is None:
+        return None
+    return 'not correct' if match.group(1) else 'correct'
+
+def could_be_valid_response(text):
+    """Whether a reply, possibly still being streamed, can still become a valid response."""
+    text = text.lower().strip()
+    return any(label.startswith(text) for label in VALID_RESPONSES)
+
+def parse_structured_reply(content):
+    """Return the result field of a JSON structured reply, or the raw content if it has none."""
     try:
-        if API_PROVIDER == "openai":
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=conversation
-            )
-            return response.choices[0].message.content
-            
-        elif API_PROVIDER == "anthropic":
-            # Convert OpenAI format to Anthropic format
-            # Extract system message if present
-            system_message = None
-            messages = []
-            
-            for msg in conversation:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                elif msg["role"] == "user":
-                    messages.append({"role": "user", "content": msg["content"]})
-                elif msg["role"] == "assistant":
-                    messages.append({"role": "assistant", "content": msg["content"]})
-            
-            # Call Anthropic API
-            kwargs = {
-                "model": MODEL_NAME,
-                "messages": messages,
-                "max_tokens": 1000
-            }
-            if system_message:
-                kwargs["system"] = system_message
-                
-            response = client.messages.create(**kwargs)
-            return response.content[0].text
-
-        elif API_PROVIDER == "google":
-            # For Gemini, the conversation history is managed differently.
-            # We will send the entire conversation history in each call.
-            # The role for the model is 'model', not 'assistant'.
-            gemini_conversation = []
-            for msg in conversation:
-                role = "model" if msg["role"] == "assistant" else "user"
-                gemini_conversation.append({"role": role, "parts": [msg["content"]]})
-            
-            # The last message should be from the user, so we pop it from the history
-            # and use it as the prompt for the generate_content call.
-            # The history parameter takes the rest of the conversation.
-            *history, current_prompt = gemini_conversation
-            chat_session = client.start_chat(history=history)
-            response = chat_session.send_message(current_prompt["parts"])
-            return response.text
-
-        elif API_PROVIDER == "control":
-            global CONTROL_NUMBER
-
-            # Find the most recent user message
-            last_user = None
-            for msg in reversed(conversation):
-                if msg["role"] == "user":
-                    last_user = msg["content"].strip()
+        return orjson.loads(content)["result"]
+    except (TypeError, ValueError, KeyError):
+        # Refusals and truncated output fall through to the correction prompt
+        return content or ""
+
+async def send_openai_request(conversation, expect_label, chat_session=None):
+    """Send one chat completion request to OpenAI."""
+    if not expect_label:
+        response = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[SYSTEM_MESSAGE, *conversation]
+        )
+        return response.choices[0].message.content
+
+    if STRUCTURED_OUTPUT:
+        response = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[SYSTEM_MESSAGE, *conversation],
+            response_format=OPENAI_RESPONSE_FORMAT
+        )
+        return parse_structured_reply(response.choices[0].message.content)
+
+    # Stream the reply and stop reading once it cannot be a valid label
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=[SYSTEM_MESSAGE, *conversation],
+        stream=True
+    )
+    text = ""
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                if not could_be_valid_response(text):
                     break
+    return text
 
-            if last_user is None:
-                # Defensive: always return a valid string
-                return "not correct"
+def anthropic_request_params(conversation, expect_label=False):
+    """Build Anthropic messages request parameters for a game conversation."""
+    # The conversation's user and assistant turns are already in Anthropic's
+    # format, so the list is reused as is apart from the cache breakpoint below.
+    messages = list(conversation)
 
-            # Game setup message: pick a fresh secret number for this game
-            if "Let's play a game!" in last_user:
-                CONTROL_NUMBER = random.randint(1, NUMBER_RANGE)
-                # Exactly this capitalization + period, per your prompt
-                return "Okay, I have a number."
+    # Mark the system prompt and the latest assistant turn as cache
+    # breakpoints, so the shared prefix is billed at the cached rate.
+    # Prefixes below the model's minimum cacheable length are not cached.
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i]["role"] == "assistant":
+            messages[i] = {
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": messages[i]["content"], "cache_control": {"type": "ephemeral"}}
+                ]
+            }
+            break
 
-            # Guess handling
-            try:
-                guess = int(last_user)
-            except ValueError:
-                # If it's not a numeric guess (e.g. correction prompt), keep returning a valid token
-                return "not correct"
+    kwargs = {
+        "model": MODEL_NAME,
+        "messages": messages,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "system": [
+            {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+        ]
+    }
+    if expect_label and STRUCTURED_OUTPUT:
+        # Force the reply through the answer tool, whose input is schema-constrained
+        kwargs["tools"] = [ANTHROPIC_ANSWER_TOOL]
+        kwargs["tool_choice"] = {"type": "tool", "name": "answer"}
+        kwargs["max_tokens"] = ANTHROPIC_TOOL_MAX_TOKENS
+    return kwargs
+
+def anthropic_reply_text(message):
+    """Return the reply in an Anthropic message, taking the answer tool's result if it was called."""
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input.get("result", "")
+    return message.content[0].text if message.content else ""
+
+async def send_anthropic_request(conversation, expect_label, chat_session=None):
+    """Send one messages request to Anthropic."""
+    kwargs = anthropic_request_params(conversation, expect_label)
+
+    if not expect_label or STRUCTURED_OUTPUT:
+        response = await client.messages.create(**kwargs)
+        return anthropic_reply_text(response)
+
+    # Stream the reply and stop reading once it cannot be a valid label
+    text = ""
+    async with client.messages.stream(**kwargs) as stream:
+        async for delta in stream.text_stream:
+            text += delta
+            if not could_be_valid_response(text):
+                break
+    return text
+
+def gemini_history(conversation):
+    """Convert an OpenAI-format conversation to Gemini chat history."""
+    # The system prompt is set on the model, and the role for the
+    # model is 'model', not 'assistant'.
+    gemini_conversation = []
+    for msg in conversation:
+        role = "model" if msg["role"] == "assistant" else "user"
+        gemini_conversation.append({"role": role, "parts": [msg["content"]]})
+    return gemini_conversation
+
+async def send_google_request(conversation, expect_label, chat_session=None):
+    """Send one chat message to Gemini; replies are not streamed.
 
-            return "correct" if guess == CONTROL_NUMBER else "not correct"        
-            
+    Given the game's chat_session, only the latest message is sent and the
+    session keeps the history. Otherwise a session is rebuilt from the
+    conversation for this one call.
+    """
+    if chat_session is None:
+        # The last message should be from the user, so we pop it from the history
+        # and use it as the prompt for the send_message call.
+        # The history parameter takes the rest of the conversation.
+        *history, current_prompt = gemini_history(conversation)
+        chat_session = client.start_chat(history=history)
+        response = await chat_session.send_message_async(current_prompt["parts"])
+        return response.text
+
+    # Structured output makes Gemini reply with exactly one of the enum values
+    generation_config = GEMINI_ANSWER_CONFIG if expect_label and STRUCTURED_OUTPUT else None
+    response = await chat_session.send_message_async(
+        conversation[-1]["content"], generation_config=generation_config
+    )
+    return response.text
+
+# Request function per provider; only the configured provider's SDK is imported
+PROVIDER_REQUESTS = {
+    "openai": send_openai_request,
+    "anthropic": send_anthropic_request,
+    "google": send_google_request,
+}
+
+async def send_request(conversation, expect_label=False, chat_session=None):
+    """Send one request to the appropriate API based on the configured provider."""
+    try:
+        return await PROVIDER_REQUESTS[API_PROVIDER](conversation, expect_label, chat_session)
     except Exception as e:
         print(f"Error calling {API_PROVIDER} API: {e}")
         raise
 
-def play_single_game():
-    """Play one complete guessing game and return the number of attempts needed."""
+async def get_cached_setup_response():
+    """Return the model's reply to the setup prompt, asking the API only on a cache miss."""
+    cache = LLMCache(SETUP_CACHE_FILE)
+    key = LLMCache.make_key(API_PROVIDER, MODEL_NAME, SYSTEM_PROMPT, SETUP_PROMPT)
+    response = cache.get(key)
+    if response is None:
+        response = await call_api([{"role": "user", "content": SETUP_PROMPT}])
+        cache.set(key, response)
+    return response
 
-    conversation = [
-    {"role": "user", "content": f"""Let's play a game! You will think of a number from 1 to {NUMBER_RANGE}. I will then try to guess it.
+async def request_setup_choices(conversation, num_choices):
+    """Ask OpenAI for several independent replies to the setup prompt in one request."""
+    response = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=[SYSTEM_MESSAGE, *conversation],
+        n=num_choices
+    )
+    return [choice.message.content for choice in response.choices]
 
-    Your task is to respond to my guesses with one of two exact strings:
-    - 'correct'
-    - 'not correct'
+async def get_batched_setup_responses(num_games):
+    """Return one fresh setup reply per game, using as few OpenAI requests as possible."""
+    conversation = [{"role": "user", "content": SETUP_PROMPT}]
+    batch_sizes = [
+        min(MAX_CHOICES_PER_REQUEST, num_games - start)
+        for start in range(0, num_games, MAX_CHOICES_PER_REQUEST)
+    ]
+    batches = await asyncio.gather(
+        *(throttled_request(request_setup_choices, conversation, size) for size in batch_sizes)
+    )
+    return [response for batch in batches for response in batch]
 
-    You must always reply. Under no circumstances should you give an empty or blank response. Do not add any other words or punctuation.
+def play_control_game():
+    """Play one game against a uniformly random secret number, without any API calls."""
+    secret_number = random.randint(1, NUMBER_RANGE)
+    guess_sequence = random.sample(GUESS_VALUES, NUMBER_RANGE)
+    for attempts, guess in enumerate(guess_sequence, start=1):
+        if guess == secret_number:
+            return attempts
+    return None
+
+async def play_single_game(game_id, gamesetup_response=None):
+    """Play one complete guessing game and return the number of attempts needed.
+
+    If gamesetup_response is given it is used as the model's reply to the setup
+    prompt, otherwise the model is asked for it.
+    """
+    if API_PROVIDER == "control":
+        return play_control_game()
+
+    # Earlier messages are never edited, only appended to
+    conversation = [{"role": "user", "content": SETUP_PROMPT}]
 
-    First, think of your number. Let me know you are ready by responding with 'Okay, I have a number.'. Do not reveal the number."""}
-    ]    
-    
     # Get the model to think of a number
-    gamesetup_response = call_api(conversation)
+    if gamesetup_response is None:
+        gamesetup_response = await call_api(conversation)
     conversation.append({"role": "assistant", "content": gamesetup_response})
-    print(f"Model response: {gamesetup_response}")
-    
+    print(f"[Game {game_id}] Model response: {gamesetup_response}")
+
+    # Gemini keeps the game's history in one chat session, so each turn sends only the new message
+    chat_session = None
+    if API_PROVIDER == "google":
+        chat_session = client.start_chat(history=gemini_history(conversation))
+
     # Create a random permutation of numbers 1 to NUMBER_RANGE
-    guess_sequence = list(range(1, NUMBER_RANGE + 1))
-    random.shuffle(guess_sequence)
-    
+    guess_sequence = random.sample(GUESS_VALUES, NUMBER_RANGE)
+
     attempts = 0
     while attempts < len(guess_sequence):
         guess = guess_sequence[attempts]
         attempts += 1
-        CONTROL_NUMBER = None  # used only when API_PROVIDER == "control"
         conversation.append({"role": "user", "content": str(guess)})
         
-        response = call_api(conversation)
+        response = await call_api(conversation, expect_label=True, chat_session=chat_session)
         conversation.append({"role": "assistant", "content": response})
         
-        print(f"Attempt {attempts}: Guess {guess} -> {response}")
+        print(f"[Game {game_id}] Attempt {attempts}: Guess {guess} -> {response}")
         
         # Check if the response is valid
-        response_lower = response.lower().strip()
-        while response_lower not in ['correct', 'not correct']:
+        response_label = classify_response(response)
+        corrections = 0
+        while response_label is None:
+            if corrections == MAX_MALFORMED_RETRIES:
+                print(f"[Game {game_id}] Warning: No valid response after {corrections} corrections, game abandoned")
+                return None
+            corrections += 1
             correction = "Please answer with the exact string 'correct' if I guessed right or the exact string 'not correct' if I guessed wrong"
-            print(f"Correction needed: {correction}")
+            print(f"[Game {game_id}] Correction needed: {correction}")
             conversation.append({"role": "user", "content": correction})
-            response = call_api(conversation)
+            response = await call_api(conversation, expect_label=True, chat_session=chat_session)
             conversation.append({"role": "assistant", "content": response})
-            response_lower = response.lower().strip()
-            print(f"Corrected response: {response}")
+            response_label = classify_response(response)
+            print(f"[Game {game_id}] Corrected response: {response}")
         
-        if response_lower == 'correct':
+        if response_label == 'correct':
             return attempts
-    
+
     # If we've tried all numbers and none were correct, something went wrong
-    print("Warning: All numbers tried, no correct answer found")
+    print(f"[Game {game_id}] Warning: All numbers tried, no correct answer found")
     return None
 
+class BatchProcessor:
+    """Runs a set of conversation requests as one OpenAI or Anthropic Batch API job."""
+
+    def __init__(self, input_path, poll_interval):
+        self.input_path = input_path
+        self.poll_interval = poll_interval
+        # Batch calls bypass throttled_request, so let the SDK retry them instead
+        self.client = client.with_options(max_retries=MAX_RETRIES)
+
+    def write_input(self, requests):
+        """Write (custom_id, conversation) pairs as an OpenAI Batch API input file."""
+        os.makedirs(os.path.dirname(self.input_path), exist_ok=True)
+        with open(self.input_path, 'wb') as f:
+            for custom_id, conversation in requests:
+                line = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": MODEL_NAME, "messages": [SYSTEM_MESSAGE, *conversation]}
+                }
+                if STRUCTURED_OUTPUT:
+                    line["body"]["response_format"] = OPENAI_RESPONSE_FORMAT
+                f.write(orjson.dumps(line) + b"\n")
+
+    async def run(self, requests):
+        """Submit the requests, wait for the batch to finish and return replies by custom_id."""
+        if API_PROVIDER == "anthropic":
+            return await self.run_anthropic(requests)
+        return await self.run_openai(requests)
+
+    async def run_openai(self, requests):
+        """Run the requests through the OpenAI Batch API, via an uploaded input file."""
+        self.write_input(requests)
+        with open(self.input_path, 'rb') as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+            # request_counts is not reported until the batch starts processing
+            completed = batch.request_counts.completed if batch.request_counts else 0
+            print(f"Batch {batch.id}: {batch.status} ({completed}/{len(requests)})")
+
+        if batch.output_file_id is None:
+            raise RuntimeError(f"Batch {batch.id} ended with status {batch.status} and no output")
+
+        output = await self.client.files.content(batch.output_file_id)
+        replies = {}
+        for line in output.text.splitlines():
+            result = orjson.loads(line)
+            if result.get("error") is None and result["response"]["status_code"] == 200:
+                content = result["response"]["body"]["choices"][0]["message"]["content"]
+                replies[result["custom_id"]] = parse_structured_reply(content) if STRUCTURED_OUTPUT else content
+        return replies
+
+    async def run_anthropic(self, requests):
+        """Run the requests through the Anthropic Message Batches API."""
+        batch = await self.client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": anthropic_request_params(conversation, expect_label=True)}
+            for custom_id, conversation in requests
+        ])
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(self.poll_interval)
+            batch = await self.client.messages.batches.retrieve(batch.id)
+            print(f"Batch {batch.id}: {batch.processing_status} ({batch.request_counts.succeeded}/{len(requests)})")
+
+        replies = {}
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                replies[entry.custom_id] = anthropic_reply_text(entry.result.message)
+        return replies
+
+def plan_batch_game(gamesetup_response):
+    """Return the guess sequence and the conversation for every turn of one game.
+
+    A game only continues while the model answers 'not correct', so the
+    conversation for each turn is known before any guess is answered.
+    """
+    conversation = [
+        {"role": "user", "content": SETUP_PROMPT},
+        {"role": "assistant", "content": gamesetup_response}
+    ]
+
+    guess_sequence = random.sample(GUESS_VALUES, NUMBER_RANGE)
+
+    turns = []
+    for guess in guess_sequence:
+        conversation = conversation + [{"role": "user", "content": str(guess)}]
+        turns.append(conversation)
+        conversation = conversation + [{"role": "assistant", "content": "not correct"}]
+    return guess_sequence, turns
+
+def score_batch_game(game_id, guess_sequence, replies):
+    """Return the attempts needed for one batch game given its replies in turn order."""
+    for attempts, (guess, response) in enumerate(zip(guess_sequence, replies), start=1):
+        print(f"[Game {game_id}] Attempt {attempts}: Guess {guess} -> {response}")
+        response_label = classify_response(response) if response is not None else None
+        if response_label == 'correct':
+            return attempts
+        if response_label is None:
+            # Malformed or missing replies cannot be corrected in an offline batch
+            print(f"[Game {game_id}] Warning: Invalid response, game abandoned")
+            return None
+
+    print(f"[Game {game_id}] Warning: All numbers tried, no correct answer found")
+    return None
+
+async def get_setup_responses():
+    """Return the setup reply each game starts from, or None where the game asks for it."""
+    # The control provider plays without a setup turn
+    if API_PROVIDER == "control":
+        return [None] * NUM_GAMES
+    if CACHE_SETUP_RESPONSE:
+        return [await get_cached_setup_response()] * NUM_GAMES
+    if API_PROVIDER == "openai":
+        return await get_batched_setup_responses(NUM_GAMES)
+    return [None] * NUM_GAMES
+
+def save_results(filename, attempt_counts, games_played):
+    """Write the results summary for the games played so far to filename and return it.
+
+    The file is replaced atomically, so plot_histogram.py never reads a partial file.
+    """
+    counts = np.asarray(attempt_counts, dtype=np.int64)
+    results = {
+        "api_provider": API_PROVIDER,
+        "model": MODEL_NAME,
+        "timestamp": timestamp,
+        "number_range": NUMBER_RANGE,
+        "num_games": NUM_GAMES,
+        "attempt_counts": attempt_counts,
+        "cumulative_percentage": (counts.cumsum() * (100.0 / NUM_GAMES)).tolist(),
+        "games_completed": sum(attempt_counts),
+        "games_failed": games_played - sum(attempt_counts),
+        "games_played": games_played
+    }
+
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    os.replace(temp_filename, filename)
+    return results
+
+# Outcomes recorded so far, keyed by attempts needed (None for failed games). The event
+# loop runs record_game on one thread, so the counter needs no lock.
+progress_counts = Counter()
+
+def record_game(games_file, game_id, attempts_needed):
+    """Append one game's outcome to the per-game log and update the progress file."""
+    games_file.write(orjson.dumps({"game": game_id, "attempts": attempts_needed}) + b"\n")
+    games_file.flush()
+
+    progress_counts[attempts_needed] += 1
+    save_results(progress_filename, [progress_counts[i + 1] for i in range(NUMBER_RANGE)], progress_counts.total())
+
+    if attempts_needed is not None:
+        print(f"✓ Game {game_id} completed in {attempts_needed} attempts")
+    else:
+        print(f"✗ Game {game_id} failed to complete properly")
+
+async def play_and_record_game(game_id, gamesetup_response, games_file):
+    """Play one game and log its outcome as soon as it finishes."""
+    attempts_needed = await play_single_game(game_id, gamesetup_response)
+    record_game(games_file, game_id, attempts_needed)
+
+async def main_async(games_file):
+    """Play all games concurrently, logging each outcome to games_file."""
+    setup_responses = await get_setup_responses()
+    await asyncio.gather(*(
+        play_and_record_game(game, setup_responses[game - 1], games_file)
+        for game in range(1, NUM_GAMES + 1)
+    ))
+
+async def main_batch_async(games_file):
+    """Play all games through the Batch API, logging each outcome to games_file."""
+    setup_responses = await get_setup_responses()
+    if None in setup_responses:
+        # Batch games cannot ask for their own setup reply, so fetch them all up front
+        setup_conversation = [{"role": "user", "content": SETUP_PROMPT}]
+        setup_responses = await asyncio.gather(*(call_api(setup_conversation) for _ in range(NUM_GAMES)))
+    games = [plan_batch_game(setup_response) for setup_response in setup_responses]
+
+    requests = [
+        (f"game-{game}-turn-{turn}", conversation)
+        for game, (_, turns) in enumerate(games, start=1)
+        for turn, conversation in enumerate(turns, start=1)
+    ]
+    replies = await BatchProcessor(BATCH_INPUT_FILE, BATCH_POLL_INTERVAL).run(requests)
+
+    for game, (guess_sequence, turns) in enumerate(games, start=1):
+        game_replies = [replies.get(f"game-{game}-turn-{turn}") for turn in range(1, len(turns) + 1)]
+        record_game(games_file, game, score_batch_game(game, guess_sequence, game_replies))
+
+async def run_experiment(games_file):
+    """Play all games in the configured mode, then close the HTTP connection pool."""
+    try:
+        if USE_BATCH_API:
+            await main_batch_async(games_file)
+        else:
+            await main_async(games_file)
+    finally:
+        if http_client is not None:
+            await http_client.aclose()
+
 # Main execution
 print(f"Starting experiment with {API_PROVIDER} API using model {MODEL_NAME}")
 print(f"Playing {NUM_GAMES} games with numbers from 1 to {NUMBER_RANGE}\n")
 
-for game in range(1, NUM_GAMES + 1):
-    print(f"\nGame {game}")
-    print("=" * 40)
-    attempts_needed = play_single_game()
-    
-    # Record the result (subtract 1 for 0-based indexing)
-    if attempts_needed is not None:
-        attempt_counts[attempts_needed - 1] += 1
-        print(f"✓ Game completed in {attempts_needed} attempts")
+os.makedirs("results", exist_ok=True)
+timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+safe_model_name = MODEL_NAME.replace("-", "_").replace(".", "_")
+
+# Each game's outcome is appended to the log as it finishes, so a crashed run keeps
+# its data. The progress file is rewritten alongside it for the plot's watch mode,
+# while the results file is only written once the run is complete.
+results_filename = f"results/results_{API_PROVIDER}_{safe_model_name}_{timestamp}.json"
+progress_filename = f"results/progress_{API_PROVIDER}_{safe_model_name}_{timestamp}.json"
+games_filename = f"results/games_{API_PROVIDER}_{safe_model_name}_{timestamp}.jsonl"
+with open(games_filename, 'ab') as games_file:
+    if uvloop is not None:
+        uvloop.run(run_experiment(games_file))
     else:
-        print(f"✗ Game failed to complete properly")
-    
-    print()
+        asyncio.run(run_experiment(games_file))
+
+# Every game was tallied by attempts needed in progress_counts as it was recorded
+attempt_counts = [progress_counts[i + 1] for i in range(NUMBER_RANGE)]
+
+# Save the final results, which replace the progress file
+results = save_results(results_filename, attempt_counts, NUM_GAMES)
+if os.path.exists(progress_filename):
+    os.remove(progress_filename)
 
 # Calculate and display results
 print("\n" + "=" * 50)
 print("RESULTS SUMMARY")
 print("=" * 50)
 
-cumulative_percentage = []
-cumulative_sum = 0
-
-for i, count in enumerate(attempt_counts):
-    cumulative_sum += count
-    percentage = (count / NUM_GAMES) * 100
-    cumulative_percentage_value = (cumulative_sum / NUM_GAMES) * 100
-    cumulative_percentage.append(cumulative_percentage_value)
-    print(f"Attempt {i+1}: {count} games ({percentage:.1f}%), Cumulative: {cumulative_percentage_value:.1f}%")
-
-# Save results to file
-os.makedirs("results", exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-safe_model_name = MODEL_NAME.replace("-", "_").replace(".", "_")
-filename = f"results/results_{API_PROVIDER}_{safe_model_name}_{timestamp}.json"
-
-results = {
-    "api_provider": API_PROVIDER,
-    "model": MODEL_NAME,
-    "timestamp": timestamp,
-    "number_range": NUMBER_RANGE,
-    "num_games": NUM_GAMES,
-    "attempt_counts": attempt_counts,
-    "cumulative_percentage": cumulative_percentage,
-    "games_completed": sum(attempt_counts),
-    "games_failed": NUM_GAMES - sum(attempt_counts)
-}
+percentage = np.asarray(attempt_counts, dtype=np.int64) * (100.0 / NUM_GAMES)
+cumulative_percentage = results["cumulative_percentage"]
 
-with open(filename, 'w') as f:
-    json.dump(results, f, indent=2)
+print("\n".join(
+    f"Attempt {i+1}: {count} games ({pct:.1f}%), Cumulative: {cum_pct:.1f}%"
+    for i, (count, pct, cum_pct) in enumerate(zip(attempt_counts, percentage, cumulative_percentage))
+))
 
 print(f"\nTotal games played: {NUM_GAMES}")
 print(f"Games completed successfully: {sum(attempt_counts)}")
 print(f"Results by attempt: {attempt_counts}")
-print(f"Results saved to: {filename}")
\ No newline at end of file
+print(f"Results saved to: {results_filename}")
+print(f"Per-game log saved to: {games_filename}")
\ No newline at end of file